@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+
+import math
+
+from numba import float32, float64, guvectorize
+
+from gnss_tools.geodesy import GRS80_A, GRS80_B, GRS80_E2, GRS80_EP2
+
+
+# compiled counterparts of the `geodesy` transformations
+# ******************************************************
+# Generalized ufuncs: every point goes through the whole trig pipeline in one
+# loop, so no temporary arrays are created, and NumPy broadcasting handles
+# any leading dimensions.  The float32 signatures only change the storage;
+# the arithmetic is done in float64 (the GRS80 constants are float64).
+# NaN inputs (epochs missing for a satellite) must propagate to the output,
+# so the fast-math flags leave out 'nnan' and 'ninf'.
+FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+@guvectorize(
+    [(t[:], t[:], t[:], t[:], t[:], t[:]) for t in (float32, float64)],
+    '(n),(n),(n)->(n),(n),(n)',
+    nopython=True, fastmath=FASTMATH, cache=True
+)
+def ecef_to_geo_grs80(x, y, z, lon, lat, h):
+    """Compiled ECEF to geographic (GRS80) transformation; see `geodesy`."""
+    for i in range(x.shape[0]):
+        p = math.hypot(x[i], y[i])
+        th = math.atan2(z[i] * GRS80_A, p * GRS80_B)
+        sin_th, cos_th = math.sin(th), math.cos(th)
+
+        phi = math.atan2(z[i] + GRS80_EP2 * GRS80_B * sin_th**3,
+                         p - GRS80_E2 * GRS80_A * cos_th**3)
+        n = GRS80_A / math.sqrt(1. - GRS80_E2 * math.sin(phi)**2)
+
+        lon[i] = math.atan2(y[i], x[i])
+        lat[i] = phi
+        h[i] = p / math.cos(phi) - n
+
+
+@guvectorize(
+    [(float64, float64, t[:], t[:], t[:], t[:], t[:]) for t in (float32, float64)],
+    '(),(),(n),(n),(n)->(n),(n)',
+    nopython=True, fastmath=FASTMATH, cache=True
+)
+def ecef_to_az_el(lon0, lat0, x, y, z, az, el):
+    """Compiled azimuth/elevation computation; see `geodesy`."""
+    sin_lon, cos_lon = math.sin(lon0), math.cos(lon0)
+    sin_lat, cos_lat = math.sin(lat0), math.cos(lat0)
+
+    # observer's foot point on the ellipsoid
+    n0 = GRS80_A / math.sqrt(1. - GRS80_E2 * sin_lat**2)
+    x0 = n0 * cos_lat * cos_lon
+    y0 = n0 * cos_lat * sin_lon
+    z0 = n0 * (1. - GRS80_E2) * sin_lat
+
+    for i in range(x.shape[0]):
+        dx, dy, dz = x[i] - x0, y[i] - y0, z[i] - z0
+
+        # rotate to the local (east, north, up) frame
+        e = -sin_lon * dx + cos_lon * dy
+        n = -sin_lat * cos_lon * dx - sin_lat * sin_lon * dy + cos_lat * dz
+        u = cos_lat * cos_lon * dx + cos_lat * sin_lon * dy + sin_lat * dz
+
+        a = math.atan2(e, n)
+        az[i] = a + 2. * math.pi if a < 0. else a
+        el[i] = math.atan2(u, math.hypot(e, n))
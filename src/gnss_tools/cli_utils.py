@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+
+import argparse
+import datetime
+import logging
+import os
+import sys
+
+import numpy as np
+
+import gnsstoolbox.orbits as orb
+
+
+# some constants
+EXIT_CODE_FILE_NOT_FOUND = -99
+EXIT_CODE_SV_MISSING = -98
+EXIT_CODE_FILE_INVALID = -97
+MJD_EPOCH = np.datetime64('1858-11-17T00:00:00', 's')
+MJD_ORDINAL = datetime.date(1858, 11, 17).toordinal()
+SP3_BAD_CLOCK = 999999.999999
+
+# observer position limits; positions closer than GEOGRAPHIC_RANGE_LIMIT
+# to the geocenter are taken as geographic coordinates (λ, φ, h)
+GEOGRAPHIC_RANGE_LIMIT = 6.3e6
+GEOGRAPHIC_LOWER = np.array([-180., -90., 0.])
+GEOGRAPHIC_UPPER = np.array([360., 90., 9000.])
+ECEF_LIMIT = 6.4e6
+
+
+# functions for the command line parser
+# *************************************
+
+def validate_sv_id(sv_id):
+    """Validate the satellite ID given as command line argument."""
+    # 'ALL' selects every satellite in the file
+    if sv_id == 'ALL':
+        return sv_id
+
+    # 1st character should denote the GNSS system
+    if not sv_id.startswith(('G', 'R', 'E')):
+        raise argparse.ArgumentTypeError("Invalid SV constellation.")
+
+    # the next 2 should be the ID
+    try:
+        id_ = int(sv_id[1:])  # noqa: F841
+    except ValueError:
+        raise argparse.ArgumentTypeError("Invalid SV ID.")
+
+    return sv_id
+
+
+def validate_observer_position(pos):
+    """Validate the observer coordinates given as command line argument.
+
+    Returns the coordinates as a float64 array.
+    """
+    pos = np.asarray(pos, dtype=np.float64)
+
+    # check for range from geocenter (squared, to skip the sqrt)
+    if np.dot(pos, pos) < GEOGRAPHIC_RANGE_LIMIT**2:
+        # check geographic coordinate ranges (the height bound is exclusive)
+        if not ((GEOGRAPHIC_LOWER <= pos).all()
+                and (pos[:2] <= GEOGRAPHIC_UPPER[:2]).all()
+                and pos[2] < GEOGRAPHIC_UPPER[2]):
+            raise argparse.ArgumentTypeError("Geographic coordinates out of range.")
+    else:
+        # check ECEF coordianates
+        if not (np.abs(pos) < ECEF_LIMIT).all():
+            raise argparse.ArgumentTypeError("ECEF coordinates out of range.")
+
+    return pos
+
+
+def make_parser(description, epilog, save_help):
+    """Build a command line parser holding the arguments common to all tools."""
+    parser = argparse.ArgumentParser(description=description, epilog=epilog)
+
+    parser.add_argument(
+        'sp3',
+        help="the file to query"
+    )
+
+    parser.add_argument('--sv_id',
+        type=validate_sv_id,
+        help="""the satellite to plot.
+    Use RINEX v.3 notation eg. G09, R17, E21, etc., or ALL for every satellite in the file
+    (with -s/--save only; the plots are saved, not displayed).
+    If not given, the first satellite in the file will be used (usually G01)"""
+    )
+
+    parser.add_argument(
+        '--fp32',
+        action='store_true',
+        help="""store the coordinates in single precision, at up to ~3 m error.
+    Halves the memory of the transforms only with numba installed (the `fast` extra)"""
+    )
+
+    parser.add_argument(
+        '-s', '--save',
+        action='store_true',
+        help=save_help
+    )
+
+    parser.add_argument(
+        '--no-show',
+        action='store_true',
+        help="when saving, do not display the plot"
+    )
+
+    return parser
+
+
+def parse_args(parser, argv=None):
+    """Parse the command line, checking the argument combinations `argparse` cannot."""
+    args = parser.parse_args(argv)
+
+    # one plot per satellite is too many to display, so they can only be saved
+    if args.sv_id == 'ALL' and not args.save:
+        parser.error("argument --sv_id: ALL requires -s/--save")
+
+    return args
+
+
+def show_plot(args):
+    """Tell whether the plot should be displayed."""
+    if args.sv_id == 'ALL':
+        return False
+    if not args.save:
+        return True
+
+    # a saved plot is not displayed with `--no-show`, or on X11/Wayland without a display
+    if sys.platform.startswith(('linux', 'freebsd')):
+        has_display = bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+    else:
+        has_display = True
+
+    return has_display and not args.no_show
+
+
+# time conversions
+# ****************
+
+def mjd_to_datetime64(mjd_arr):
+    """Convert an array of MJDs to `datetime64[s]` epochs."""
+    # round to the nearest second; MJD floats carry sub-microsecond noise
+    secs = np.rint(np.asarray(mjd_arr, dtype=np.float64) * 86400.)
+
+    return MJD_EPOCH + secs.astype('timedelta64[s]')
+
+
+def iso_labels(epochs):
+    """Format `datetime64` epochs as ISO strings (eg. '2015-12-17T00:15:00Z')."""
+    return np.datetime_as_string(epochs, unit='s', timezone='UTC')
+
+
+# file readers
+# ************
+
+def check_sp3_header(f):
+    """Raise `ValueError` unless the open file `f` starts with a SP3-c/d header."""
+    # same format check as `gnsstoolbox`
+    if not f.readline().startswith(('#c', '#d')):
+        raise ValueError(f"{f.name} is not a SP3-c/d file.")
+
+
+def load_sp3_single(path, sv_id):
+    """Read the positions of a single satellite (eg. G09) from a SP3 file.
+
+    Returns an (N, 5) array as `orbit.getSp3` does: mjd, X, Y, Z (km), dte (us).
+    """
+    record = f'P{sv_id[0]}{int(sv_id[1:]):02d}'
+
+    rows = []
+    mjd = None
+    with open(path, 'r', encoding='utf-8', errors='replace', buffering=1 << 20) as f:
+        check_sp3_header(f)
+
+        for line in f:
+            if line.startswith('*'):
+                year, month, day, hour, minute, sec = line[1:].split()[:6]
+                days = datetime.date(int(year), int(month), int(day)).toordinal() - MJD_ORDINAL
+                mjd = days + (int(hour) * 3600. + int(minute) * 60. + float(sec)) / 86400.
+            elif mjd is not None and line.startswith(record):
+                x, y, z, dte = (float(v) for v in line[4:].split()[:4])
+                if abs(dte - SP3_BAD_CLOCK) >= 100.:
+                    rows.append((mjd, x, y, z, dte))
+
+    return np.asarray(rows, dtype=np.float64).reshape(-1, 5)
+
+
+def orbit_to_array_all(orbit):
+    """Stack the positions of all GPS, GLONASS and Galileo satellites of a loaded orbit.
+
+    Returns the SV IDs, the (N,) epochs (mjd) and a NaN-padded (3, S, N) X, Y, Z (km).
+    """
+    sv_ids = [sv for sv in orbit.ListSat if sv.startswith(('G', 'R', 'E'))]
+    if not sv_ids:
+        return sv_ids, np.empty(0), np.empty((3, 0, 0))
+
+    sp3 = [orbit.getSp3(sv[0], int(sv[1:]))[0] for sv in sv_ids]
+    mjd = np.unique(np.concatenate([rows[:, 0] for rows in sp3]))
+
+    xyz = np.full((3, len(sv_ids), len(mjd)), np.nan)
+    for i, rows in enumerate(sp3):
+        xyz[:, i, np.searchsorted(mjd, rows[:, 0])] = rows[:, 1:4].T
+
+    return sv_ids, mjd, xyz
+
+
+def load_positions(args):
+    """Load the positions of the satellite(s) selected on the command line, or exit.
+
+    Returns the SV IDs, the (N,) epochs (mjd) and a (3, S, N) X, Y, Z (km).
+    """
+    single = args.sv_id is not None and args.sv_id != 'ALL'
+
+    # unreadable and non-SP3 files are reported the same way whichever the reader
+    try:
+        if single:
+            # stream the SP3 file, keeping only the requested satellite
+            rows = load_sp3_single(args.sp3, args.sv_id)
+        else:
+            with open(args.sp3, 'r', encoding='utf-8', errors='replace') as f:
+                check_sp3_header(f)
+    except OSError:
+        logging.error(f"File \'{args.sp3}\' not found.  Exiting.")
+        sys.exit(EXIT_CODE_FILE_NOT_FOUND)
+    except ValueError:
+        logging.error(f"File \'{args.sp3}\' is not a SP3 file.  Exiting.")
+        sys.exit(EXIT_CODE_FILE_INVALID)
+
+    if single:
+        sv_ids = [f'{args.sv_id[0]}{int(args.sv_id[1:]):02d}']
+        mjd, xyz = rows[:, 0], rows[:, 1:4].T[:, np.newaxis]
+    else:
+        # load the whole SP3 file
+        orbit = orb.orbit()
+        failure = orbit.loadSp3(args.sp3)
+        if failure:
+            logging.error(f"File \'{args.sp3}\' not found.  Exiting.")
+            sys.exit(EXIT_CODE_FILE_NOT_FOUND)
+
+        if args.sv_id == 'ALL':
+            sv_ids, mjd, xyz = orbit_to_array_all(orbit)
+        else:
+            # use the 1st satellite in the file
+            sv_ids = orbit.ListSat[:1]
+            rows = orbit.getSp3(sv_ids[0][0], int(sv_ids[0][1:]))[0]
+            mjd, xyz = rows[:, 0], rows[:, 1:4].T[:, np.newaxis]
+
+    # if requested satellite is not present (ie. the length of the orbit is 0), exit
+    if mjd.size == 0:
+        logging.error(f"Satellite \'{args.sv_id}\' not in file.  Exiting.")
+        sys.exit(EXIT_CODE_SV_MISSING)
+
+    return sv_ids, mjd, xyz
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+
+import math
+
+import numpy as np
+
+
+# IAG GRS80 constants
+GRS80_A = 6378137.0
+GRS80_F = 1. / 298.257222101
+GRS80_B = GRS80_A * (1. - GRS80_F)
+GRS80_E2 = GRS80_F * (2. - GRS80_F)
+GRS80_EP2 = GRS80_E2 / (1. - GRS80_E2)
+
+# compiled kernels; `None` until first use, `False` if numba is not available
+_kernels = None
+
+
+def _load_kernels():
+    """Import the numba kernels on first use, so that importing this module stays cheap."""
+    global _kernels
+    if _kernels is None:
+        try:
+            from gnss_tools import _numba_kernels
+            _kernels = _numba_kernels
+        except ImportError:
+            # missing, or installed but incompatible with this NumPy
+            _kernels = False
+
+    return _kernels
+
+
+def _as_float_array(arr):
+    """Return `arr` as a float32 or float64 array, without copying if possible."""
+    arr = np.asarray(arr)
+    if arr.dtype not in (np.float32, np.float64):
+        arr = arr.astype(np.float64)
+
+    return arr
+
+
+# coordinate transformations
+# **************************
+
+def _ecef_to_geo_grs80_numpy(x, y, z):
+    """NumPy fallback of the ECEF to geographic transformation."""
+    p = np.hypot(x, y)
+    th = np.arctan2(z * GRS80_A, p * GRS80_B)
+
+    lon = np.arctan2(y, x)
+    lat = np.arctan2(z + GRS80_EP2 * GRS80_B * np.sin(th)**3,
+                     p - GRS80_E2 * GRS80_A * np.cos(th)**3)
+    n = GRS80_A / np.sqrt(1. - GRS80_E2 * np.sin(lat)**2)
+    h = p / np.cos(lat) - n
+
+    return np.stack((lon, lat, h))
+
+
+def _ecef_to_az_el_numpy(lon0, lat0, x, y, z):
+    """NumPy fallback of the azimuth/elevation computation."""
+    sin_lon, cos_lon = math.sin(lon0), math.cos(lon0)
+    sin_lat, cos_lat = math.sin(lat0), math.cos(lat0)
+
+    # observer's foot point on the ellipsoid
+    n = GRS80_A / math.sqrt(1. - GRS80_E2 * sin_lat**2)
+    dx = x - n * cos_lat * cos_lon
+    dy = y - n * cos_lat * sin_lon
+    dz = z - n * (1. - GRS80_E2) * sin_lat
+
+    # rotate to the local (east, north, up) frame
+    e = -sin_lon * dx + cos_lon * dy
+    n = -sin_lat * cos_lon * dx - sin_lat * sin_lon * dy + cos_lat * dz
+    u = cos_lat * cos_lon * dx + cos_lat * sin_lon * dy + sin_lat * dz
+
+    az = np.mod(np.arctan2(e, n), 2. * np.pi)
+    el = np.arctan2(u, np.hypot(e, n))
+
+    return np.stack((az, el))
+
+
+def ecef_to_geo_grs80(x, y, z):
+    """Transform ECEF coordinates to geographic ones on the GRS80 ellipsoid.
+
+    `x`, `y`, `z` (m) are same-shaped arrays; returns a (3, ...) array of λ, φ (rad), h (m).
+    """
+    x, y, z = (_as_float_array(v) for v in (x, y, z))
+
+    # NaN positions give NaN coordinates, silently
+    with np.errstate(invalid='ignore'):
+        kernels = _load_kernels()
+        if kernels:
+            geo = np.empty((3,) + x.shape, dtype=x.dtype)
+            kernels.ecef_to_geo_grs80(x, y, z, *geo)
+            return geo
+
+        # compute in float64, like the kernels, then round to the input precision
+        xyz64 = (v.astype(np.float64, copy=False) for v in (x, y, z))
+        geo = _ecef_to_geo_grs80_numpy(*xyz64)
+        return geo.astype(x.dtype, copy=False)
+
+
+def ecef_to_az_el(observer, x, y, z):
+    """Compute azimuths and elevations of ECEF positions as seen by an observer.
+
+    `observer` (3,) and `x`, `y`, `z` are ECEF (m); returns a (2, ...) array of az, el (rad).
+    """
+    observer = np.asarray(observer, dtype=np.float64).reshape(3, 1)
+    lon0, lat0, _ = ecef_to_geo_grs80(*observer)[:, 0].tolist()
+
+    x, y, z = (_as_float_array(v) for v in (x, y, z))
+
+    # NaN positions give NaN angles, silently
+    with np.errstate(invalid='ignore'):
+        kernels = _load_kernels()
+        if kernels:
+            az_el = np.empty((2,) + x.shape, dtype=x.dtype)
+            kernels.ecef_to_az_el(lon0, lat0, x, y, z, *az_el)
+            return az_el
+
+        # compute in float64, like the kernels, then round to the input precision
+        xyz64 = (v.astype(np.float64, copy=False) for v in (x, y, z))
+        az_el = _ecef_to_az_el_numpy(lon0, lat0, *xyz64)
+        return az_el.astype(x.dtype, copy=False)
@@ -2,35 +2,43 @@
 # -*- coding: utf-8 -*-
 
 
-import argparse
-import logging
+import importlib.util
 import pathlib
-import sys
 
 import numpy as np
 
-import gpsdatetime as gpst
-import gnsstoolbox.orbits as orb
-import gnsstoolbox.gnsstools as tools
+from gnss_tools.cli_utils import (
+    iso_labels, load_positions, make_parser, mjd_to_datetime64, parse_args, show_plot
+)
+from gnss_tools.geodesy import ecef_to_geo_grs80
 
 
 # some constants
-EXIT_CODE_FILE_NOT_FOUND = -99
-EXIT_CODE_SV_MISSING = -98
 LABELS_INTERVAL = 50
+# plot every n-th position only
+MARKER_INTERVAL = 1
+
+# whether the GMT theme has already been set up
+_GMT_CONFIGURED = False
 
 
 # ploting functions
 # *****************
 
-def plot_track_pygmt(sv_id, geo, labels, save):
-    """Plot the satellite's ground track using `pygmt`."""
-    pygmt.config(
-        GMT_THEME='modern',
-        FONT_TITLE='9p,Helvetica-Bold,black',
-        FONT_ANNOT_PRIMARY='6p,Helvetica-Bold,black',
-        FONT_ANNOT_SECONDARY='5p,Helvetica,black'
-    )
+def make_basemap(title):
+    """Create a `pygmt` figure holding the world map, for tracks to be overlaid on."""
+    import pygmt
+
+    # GMT defaults persist for the session, so set them only once
+    global _GMT_CONFIGURED
+    if not _GMT_CONFIGURED:
+        pygmt.config(
+            GMT_THEME='modern',
+            FONT_TITLE='9p,Helvetica-Bold,black',
+            FONT_ANNOT_PRIMARY='6p,Helvetica-Bold,black',
+            FONT_ANNOT_SECONDARY='5p,Helvetica,black'
+        )
+        _GMT_CONFIGURED = True
 
     # define the map region
     region = [-180., 180., -90., 90.]
@@ -45,25 +53,36 @@ def plot_track_pygmt(sv_id, geo, labels, save):
         # resolution='h',
         land='darkgray', water='skyblue'
     )
-    fig.basemap(frame=['a30f10g30', f'+tGround track of SV {sv_id}'])
+    fig.basemap(frame=['a30f10g30', f'+t{title}'])
+
+    return fig
 
-    # plot SV positions
+
+def overlay_track(fig, geo, epochs):
+    """Plot a satellite's positions and epoch labels on a figure made by `make_basemap`."""
+    # plot SV positions (decimated before the conversion to degrees)
+    xs_deg, ys_deg = np.degrees(geo[:2, ::MARKER_INTERVAL])
     fig.plot(
-        x=np.degrees(geo[0]), y=np.degrees(geo[1]),
+        x=xs_deg, y=ys_deg,
         style='c0.05c', fill='red', pen='black'
     )
 
-    # decimate lists and plot labels
-    labels = [x for i, x in enumerate(labels) if i % LABELS_INTERVAL == 0]
-    geo[0] = [x for i, x in enumerate(geo[0]) if i % LABELS_INTERVAL == 0]
-    geo[1] = [x for i, x in enumerate(geo[1]) if i % LABELS_INTERVAL == 0]
+    # decimate (strided views) and plot labels; only the kept epochs get formatted
+    labels_x_deg, labels_y_deg = np.degrees(geo[:2, ::LABELS_INTERVAL])
     fig.text(
-        x=np.degrees(geo[0]), y=np.degrees(geo[1]),
-        text=labels,
+        x=labels_x_deg, y=labels_y_deg,
+        text=iso_labels(epochs[::LABELS_INTERVAL]),
         font='4p,Helvetica-Narrow,blue', justify='bl'
     )
 
-    fig.show()
+
+def plot_track_pygmt(sv_id, geo, epochs, save, show=True):
+    """Plot the satellite's ground track using `pygmt`."""
+    fig = make_basemap(f'Ground track of SV {sv_id}')
+    overlay_track(fig, geo, epochs)
+
+    if show:
+        fig.show()
     if save:
         png_file = pathlib.Path(__file__).parents[2]\
                                          .joinpath('plots')\
@@ -71,69 +90,41 @@ def plot_track_pygmt(sv_id, geo, labels, save):
         fig.savefig(png_file, transparent=True)
 
 
-def plot_track_plotly(sv_id, geo, labels, save):
+def plot_track_plotly(sv_id, geo, epochs, save, show=True):
     """Plot the satellite's ground track using `plotly`."""
+    import plotly.express as px
+
+    lon_deg, lat_deg = np.degrees(geo[:2])
     fig = px.scatter_geo(
-        lat=np.degrees(geo[1]), lon=np.degrees(geo[0]),
-        hover_name=labels,
+        lat=lat_deg, lon=lon_deg,
+        hover_name=iso_labels(epochs),
         title=f'Ground track of SV {sv_id}'
     )
-    fig.show()
+    if show:
+        fig.show()
 
 
-# check ploting package availability
-try:
-    import plotly.express as px
-    plot_track = plot_track_plotly
-except ModuleNotFoundError:
-    import pygmt
-    plot_track = plot_track_pygmt
+def plot_track(sv_id, geo, epochs, save, show=True):
+    """Plot the satellite's ground track using `plotly` if available, `pygmt` otherwise."""
+    # only the backend actually used gets imported
+    if importlib.util.find_spec('plotly') is not None:
+        plot_track_plotly(sv_id, geo, epochs, save, show)
+    else:
+        plot_track_pygmt(sv_id, geo, epochs, save, show)
 
 
 # functions for the command line parser
 # *************************************
 
-def validate_sv_id(sv_id):
-    """Validate the satellite ID given as command line argument."""
-    # 1st character should denote the GNSS system
-    if not sv_id.startswith(('G', 'R', 'E')):
-        raise argparse.ArgumentTypeError("Invalid SV constellation.")
-
-    # the next 2 should be the ID
-    try:
-        id_ = int(sv_id[1:])  # noqa: F841
-    except ValueError:
-        raise argparse.ArgumentTypeError("Invalid SV ID.")
-
-    return sv_id
-
-
 def parse_command_line():
     """Parse and validate the command line arguments."""
-    parser = argparse.ArgumentParser(
+    parser = make_parser(
         description="Read satellite positions from a SP3 file and plot ground tracks.",
-        epilog="The S/W currently uses `pyGMT` for the plotting, but it's `plotly`-ready."
-    )
-
-    parser.add_argument(
-        'sp3',
-        help="the file to query"
-    )
-
-    parser.add_argument('--sv_id',
-        type=validate_sv_id,
-        help="""the satellite to plot.
-    Use RINEX v.3 notation eg. G09, R17, E21, etc.
-    If not given, the first satellite in the file will be used (usually G01)"""
-    )
-
-    parser.add_argument(
-        '-s', '--save',
-        action='store_true',
-        help="save groundplot to a PNG file"
+        epilog="The S/W currently uses `pyGMT` for the plotting, but it's `plotly`-ready.",
+        save_help="save groundplot to a PNG file"
     )
 
-    return parser.parse_args()
+    return parse_args(parser)
 
 
 # the driving function
@@ -143,36 +134,26 @@ def main():
     """The driving function."""
     args = parse_command_line()
 
-    # load the SP3 file
-    orbit = orb.orbit()
-    failure = orbit.loadSp3(args.sp3)
-    if failure:
-        logging.error(f"File \'{args.sp3}\' not found.  Exiting.")
-        sys.exit(EXIT_CODE_FILE_NOT_FOUND)
-
-    # get the SV info
-    try:
-        sv_id = (args.sv_id[0], int(args.sv_id[1:]))
-    except TypeError:
-        # most likely sv_id is None, so we use the 1st satellite in the file
-        sv_id = (orbit.ListSat[0][0], int(orbit.ListSat[0][1:]))
-
-    # get SV positions
-    sp3 = orbit.getSp3(*sv_id)
-    # if requested satellite is not present (ie. the length of the orbit is 0), exit
-    if sp3[1] == 0:
-        logging.error(f"Satellite \'{args.sv_id}\' not in file.  Exiting.")
-        sys.exit(EXIT_CODE_SV_MISSING)
-
-    # time (to use as labels)
-    time_ = [gpst.gpsdatetime(mjd=x).st_iso_epoch() for x in sp3[0][:, 0]]
-
-    # transform ECEF positions to geographic
-    ecef = sp3[0][:, 1:-1] * 1000.
-    geo = list(tools.toolCartGeoGRS80(*ecef.T))
-
-    # plot
-    plot_track(f'{sv_id[0]}{sv_id[1]:02d}', geo, time_, args.save)
+    # get SV positions, as (3, S, N) slabs of X, Y, Z (km) for S satellites
+    sv_ids, mjd, xyz = load_positions(args)
+
+    # epochs (to use as labels)
+    epochs = mjd_to_datetime64(mjd)
+
+    # transform ECEF positions of all satellites to geographic in one call
+    dtype = np.float32 if args.fp32 else np.float64
+    # one contiguous (S, N) array per axis (SoA), scaled to m
+    x, y, z = np.multiply(xyz, 1000., dtype=dtype, order='C')
+    del xyz
+    geo = ecef_to_geo_grs80(x, y, z)
+
+    # plot, skipping the epochs a satellite is missing from
+    # each satellite gets its own figure (and PNG), so the map is redrawn
+    # per satellite: a `pygmt` figure cannot be copied, nor its layers removed
+    show = show_plot(args)
+    for i, sv_id in enumerate(sv_ids):
+        valid = np.isfinite(x[i])
+        plot_track(sv_id, geo[:, i, valid], epochs[valid], args.save, show)
 
 
 if __name__ == '__main__':
@@ -3,34 +3,46 @@
 
 
 import argparse
-import logging
+import importlib.util
 import pathlib
-import sys
 
 import numpy as np
 
-import gpsdatetime as gpst
-import gnsstoolbox.orbits as orb
 import gnsstoolbox.gnsstools as tools
 
+from gnss_tools.cli_utils import (
+    GEOGRAPHIC_RANGE_LIMIT, iso_labels, load_positions, make_parser, mjd_to_datetime64,
+    parse_args, show_plot, validate_observer_position
+)
+from gnss_tools.geodesy import ecef_to_az_el
+
 
 # some constants
-EXIT_CODE_FILE_NOT_FOUND = -99
-EXIT_CODE_SV_MISSING = -98
 LABELS_INTERVAL = 10
+# plot every n-th position only
+MARKER_INTERVAL = 1
+
+# whether the GMT theme has already been set up
+_GMT_CONFIGURED = False
 
 
 # ploting functions
 # *****************
 
-def sky_plot_pygmt(sv_id, az_el, labels, save):
-    """Plot the satellite's ground track using `pygmt`."""
-    pygmt.config(
-        GMT_THEME='modern',
-        FONT_TITLE='9p,Helvetica-Bold,black',
-        FONT_ANNOT_PRIMARY='6p,Helvetica-Bold,black',
-        FONT_ANNOT_SECONDARY='5p,Helvetica,black'
-    )
+def make_basemap(title):
+    """Create a `pygmt` figure holding the polar sky chart, for tracks to be overlaid on."""
+    import pygmt
+
+    # GMT defaults persist for the session, so set them only once
+    global _GMT_CONFIGURED
+    if not _GMT_CONFIGURED:
+        pygmt.config(
+            GMT_THEME='modern',
+            FONT_TITLE='9p,Helvetica-Bold,black',
+            FONT_ANNOT_PRIMARY='6p,Helvetica-Bold,black',
+            FONT_ANNOT_SECONDARY='5p,Helvetica,black'
+        )
+        _GMT_CONFIGURED = True
 
     # define the map region
     region = [0., 360., 0., 90.]
@@ -42,26 +54,37 @@ def sky_plot_pygmt(sv_id, az_el, labels, save):
     fig.basemap(
         region=region,
         projection='P17c+a+fe',
-        frame=['xa45f45g45', 'ya30f30g30', f'+tGround track of SV {sv_id}']
+        frame=['xa45f45g45', 'ya30f30g30', f'+t{title}']
     )
 
-    # plot SV positions
+    return fig
+
+
+def overlay_track(fig, az_el, epochs):
+    """Plot a satellite's positions and epoch labels on a figure made by `make_basemap`."""
+    # plot SV positions (decimated before the conversion to degrees)
+    xs_deg, ys_deg = np.degrees(az_el[:, ::MARKER_INTERVAL])
     fig.plot(
-        x=np.degrees(az_el[0]), y=np.degrees(az_el[1]),
+        x=xs_deg, y=ys_deg,
         style='c0.05c', fill='red', pen='black'
     )
 
-    # decimate lists and plot labels
-    labels = [x for i, x in enumerate(labels) if i % LABELS_INTERVAL == 0]
-    az_el[0] = [x for i, x in enumerate(az_el[0]) if i % LABELS_INTERVAL == 0]
-    az_el[1] = [x for i, x in enumerate(az_el[1]) if i % LABELS_INTERVAL == 0]
+    # decimate (strided views) and plot labels; only the kept epochs get formatted
+    labels_x_deg, labels_y_deg = np.degrees(az_el[:, ::LABELS_INTERVAL])
     fig.text(
-        x=np.degrees(az_el[0]), y=np.degrees(az_el[1]),
-        text=labels,
+        x=labels_x_deg, y=labels_y_deg,
+        text=iso_labels(epochs[::LABELS_INTERVAL]),
         font='4p,Helvetica-Narrow,blue', justify='bl'
     )
 
-    fig.show()
+
+def sky_plot_pygmt(sv_id, az_el, epochs, save, show=True):
+    """Plot the satellite's ground track using `pygmt`."""
+    fig = make_basemap(f'Ground track of SV {sv_id}')
+    overlay_track(fig, az_el, epochs)
+
+    if show:
+        fig.show()
     if save:
         png_file = pathlib.Path(__file__).parents[2]\
                                          .joinpath('plots')\
@@ -69,80 +92,38 @@ def sky_plot_pygmt(sv_id, az_el, labels, save):
         fig.savefig(png_file, transparent=True)
 
 
-def sky_plot_matplotlib(sv_id, az_el, labels, save):
+def sky_plot_matplotlib(sv_id, az_el, epochs, save, show=True):
     """Plot the satellite's ground track using `matplotlib`."""
+    import matplotlib.pyplot as plt
+
+    az_deg, el_deg = np.degrees(az_el)
     fig = plt.scatter_geo(
-        lat=np.degrees(az_el[1]), lon=np.degrees(az_el[0]),
-        hover_name=labels,
+        lat=el_deg, lon=az_deg,
+        hover_name=iso_labels(epochs),
         title=f'Ground track of SV {sv_id}'
     )
-    fig.show()
+    if show:
+        fig.show()
 
 
-# check ploting package availability
-try:
-    import pygmt
-    sky_plot = sky_plot_pygmt
-except ModuleNotFoundError:
-    import matplotlib.pyplot as plt
-    sky_plot = sky_plot_matplotlib
+def sky_plot(sv_id, az_el, epochs, save, show=True):
+    """Create the satellite's skyplot using `pygmt` if available, `matplotlib` otherwise."""
+    # only the backend actually used gets imported
+    if importlib.util.find_spec('pygmt') is not None:
+        sky_plot_pygmt(sv_id, az_el, epochs, save, show)
+    else:
+        sky_plot_matplotlib(sv_id, az_el, epochs, save, show)
 
 
 # functions for the command line parser
 # *************************************
 
-def validate_sv_id(sv_id):
-    """Validate the satellite ID given as command line argument."""
-    # 1st character should denote the GNSS system
-    if not sv_id.startswith(('G', 'R', 'E')):
-        raise argparse.ArgumentTypeError("Invalid SV constellation.")
-
-    # the next 2 should be the ID
-    try:
-        id_ = int(sv_id[1:])  # noqa: F841
-    except ValueError:
-        raise argparse.ArgumentTypeError("Invalid SV ID.")
-
-    return sv_id
-
-
-def validate_observer_position(pos):
-    """Validate the observer coordinates given as command line argument."""
-    # check for range from geocenter
-    grange = np.linalg.norm(pos)
-    if grange < 6.3e6:
-        # check geographic coordinate ranges
-        if not (-180. <= float(pos[0]) <= 360. \
-                and -90. <= float(pos[1]) <= 90. \
-                and 0. <= float(pos[2]) < 9000.):
-            raise argparse.ArgumentError("Geographic coordinates out of range.")
-    else:
-        # check ECEF coordianates
-        if not (abs(float(pos[0])) < 6.4e6 \
-                and abs(float(pos[1])) < 6.4e6 \
-                and abs(float(pos[2])) < 6.4e6):
-            raise argparse.ArgumentError("ECEF coordinates out of range.")
-
-    return pos
-
-
 def parse_command_line():
     """Parse and validate the command line arguments."""
-    parser = argparse.ArgumentParser(
+    parser = make_parser(
         description="Read satellite positions from a SP3 file and create skyplots.",
-        epilog="If available, `pyGMT` is used for plotting.  Otherwise `Matplotlib`."
-    )
-
-    parser.add_argument(
-        'sp3',
-        help="the file to query"
-    )
-
-    parser.add_argument('--sv_id',
-        type=validate_sv_id,
-        help="""the satellite to plot.
-    Use RINEX v.3 notation eg. G09, R17, E21, etc.
-    If not given, the first satellite in the file will be used (usually G01)"""
+        epilog="If available, `pyGMT` is used for plotting.  Otherwise `Matplotlib`.",
+        save_help="save skyplot to a PNG file"
     )
 
     parser.add_argument(
@@ -150,19 +131,21 @@ def parse_command_line():
         metavar='CRD',
         nargs=3,
         default=[24., 38., 500.],
-        type=validate_observer_position,
+        type=float,
         help="""the observer's position.
     Either geographic or ECEF coordinates.
     Default values (λ, φ, h): 24, 38, 500"""
     )
 
-    parser.add_argument(
-        '-s', '--save',
-        action='store_true',
-        help="save skyplot to a PNG file"
-    )
+    args = parse_args(parser)
+
+    # the position can only be checked as a whole, ie. after parsing
+    try:
+        args.observer = validate_observer_position(args.observer)
+    except argparse.ArgumentTypeError as err:
+        parser.error(f"argument -o/--observer: {err}")
 
-    return parser.parse_args()
+    return args
 
 
 # the driving function
@@ -173,41 +156,31 @@ def main():
     args = parse_command_line()
 
     # observer's position
-    pos = args.observer
-    if np.linalg.norm(pos) < 6.3e7:  # position is given in geographic coordinates
-        pos[:-1] = np.radians(pos[:-1])
-        pos = list(tools.tool_geocart_GRS80(*pos))
-
-    # load the SP3 file
-    orbit = orb.orbit()
-    failure = orbit.loadSp3(args.sp3)
-    if failure:
-        logging.error(f"File \'{args.sp3}\' not found.  Exiting.")
-        sys.exit(EXIT_CODE_FILE_NOT_FOUND)
-
-    # get the SV info
-    try:
-        sv_id = (args.sv_id[0], int(args.sv_id[1:]))
-    except TypeError:
-        # most likely sv_id is None, so we use the 1st satellite in the file
-        sv_id = (orbit.ListSat[0][0], int(orbit.ListSat[0][1:]))
-
-    # get SV positions
-    sp3 = orbit.getSp3(*sv_id)
-    # if requested satellite is not present (ie. the length of the orbit is 0), exit
-    if sp3[1] == 0:
-        logging.error(f"Satellite \'{args.sv_id}\' not in file.  Exiting.")
-        sys.exit(EXIT_CODE_SV_MISSING)
-
-    # time (to use as labels)
-    time_ = [gpst.gpsdatetime(mjd=x).st_iso_epoch() for x in sp3[0][:, 0]]
-
-    # transform ECEF positions to azimuth/elevation pairs
-    ecef = sp3[0][:, 1:-1] * 1000.
-    az_el = list(tools.tool_az_ele_h(*pos, *ecef.T))
-
-    # plot
-    sky_plot(f'{sv_id[0]}{sv_id[1]:02d}', az_el, time_, args.save)
+    pos = np.asarray(args.observer, dtype=np.float64)
+    if np.dot(pos, pos) < GEOGRAPHIC_RANGE_LIMIT**2:  # given in geographic coordinates
+        np.deg2rad(pos[:2], out=pos[:2])
+        pos = np.array(tools.tool_geocart_GRS80(*pos))
+
+    # get SV positions, as (3, S, N) slabs of X, Y, Z (km) for S satellites
+    sv_ids, mjd, xyz = load_positions(args)
+
+    # epochs (to use as labels)
+    epochs = mjd_to_datetime64(mjd)
+
+    # transform ECEF positions of all satellites to azimuth/elevation pairs in one call
+    dtype = np.float32 if args.fp32 else np.float64
+    # one contiguous (S, N) array per axis (SoA), scaled to m
+    x, y, z = np.multiply(xyz, 1000., dtype=dtype, order='C')
+    del xyz
+    az_el = ecef_to_az_el(pos, x, y, z)
+
+    # plot, skipping the epochs a satellite is missing from
+    # each satellite gets its own figure (and PNG), so the polar frame is redrawn
+    # per satellite: a `pygmt` figure cannot be copied, nor its layers removed
+    show = show_plot(args)
+    for i, sv_id in enumerate(sv_ids):
+        valid = np.isfinite(x[i])
+        sky_plot(sv_id, az_el[:, i, valid], epochs[valid], args.save, show)
 
 
 if __name__ == '__main__':
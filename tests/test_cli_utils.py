@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+
+import argparse
+import pathlib
+
+import numpy as np
+import pytest
+
+import gnsstoolbox.orbits as orb
+
+from gnss_tools import cli_utils
+
+
+SP3_FILE = pathlib.Path(__file__).parents[1].joinpath('data', 'sp3', 'igs18754.sp3')
+
+
+@pytest.fixture(scope='module')
+def orbit():
+    """The test file, loaded by `gnsstoolbox`."""
+    orbit = orb.orbit()
+    orbit.loadSp3(str(SP3_FILE))
+
+    return orbit
+
+
+# command line validation
+# ***********************
+
+@pytest.mark.parametrize('pos', [
+    (22.96, 40.63, 50.),            # geographic
+    (-180., -90., 0.),              # geographic, lower bounds
+    (360., 90., 8999.),             # geographic, upper bounds
+    (4.2e6, 1.7e6, 4.7e6),          # ECEF
+])
+def test_validate_observer_position_accepts(pos):
+    result = cli_utils.validate_observer_position(list(pos))
+
+    assert result.dtype == np.float64
+    np.testing.assert_array_equal(result, pos)
+
+
+@pytest.mark.parametrize('pos', [
+    (22.96, 40.63, 9000.),          # height bound is exclusive
+    (22.96, 40.63, -1.),
+    (-181., 40.63, 50.),
+    (22.96, 91., 50.),
+    (6.5e6, 0., 0.),                # ECEF, too far
+])
+def test_validate_observer_position_rejects(pos):
+    with pytest.raises(argparse.ArgumentTypeError):
+        cli_utils.validate_observer_position(list(pos))
+
+
+# file readers
+# ************
+
+# G03 has epochs missing from the test file
+@pytest.mark.parametrize('sv_id', ['G01', 'G03', 'G09', 'G32'])
+def test_load_sp3_single_matches_gnsstoolbox(orbit, sv_id):
+    rows = cli_utils.load_sp3_single(SP3_FILE, sv_id)
+    ref = orbit.getSp3(sv_id[0], int(sv_id[1:]))[0]
+
+    assert len(ref) and rows.shape == (len(ref), 5)
+    np.testing.assert_allclose(rows[:, 0], ref[:, 0], rtol=0., atol=1e-9)
+    np.testing.assert_array_equal(rows[:, 1:5], ref[:, 1:5])
+
+
+def test_load_sp3_single_missing_satellite():
+    assert cli_utils.load_sp3_single(SP3_FILE, 'E11').shape == (0, 5)
+
+
+def test_load_sp3_single_rejects_other_files(tmp_path):
+    not_sp3 = tmp_path.joinpath('brdc.nav')
+    not_sp3.write_text("     3.04           N: GNSS NAV DATA    M: MIXED\n")
+
+    with pytest.raises(ValueError):
+        cli_utils.load_sp3_single(not_sp3, 'G09')
+    with pytest.raises(OSError):
+        cli_utils.load_sp3_single(tmp_path.joinpath('missing.sp3'), 'G09')
+
+
+def test_orbit_to_array_all(orbit):
+    sv_ids, mjd, xyz = cli_utils.orbit_to_array_all(orbit)
+
+    assert sv_ids and all(sv.startswith(('G', 'R', 'E')) for sv in sv_ids)
+    assert xyz.shape == (3, len(sv_ids), len(mjd))
+    assert (np.diff(mjd) > 0.).all()
+    assert np.isnan(xyz).any()
+
+    # each satellite's positions land on its epochs, the rest is NaN
+    for i, sv_id in enumerate(sv_ids):
+        ref = orbit.getSp3(sv_id[0], int(sv_id[1:]))[0]
+        present = np.isin(mjd, ref[:, 0])
+        np.testing.assert_array_equal(xyz[:, i, present], ref[:, 1:4].T)
+        assert np.isnan(xyz[:, i, ~present]).all()
+
+
+@pytest.mark.parametrize('sv_id', ['G09', None])
+def test_load_positions_exits_on_missing_file(tmp_path, sv_id):
+    args = argparse.Namespace(sp3=str(tmp_path.joinpath('missing.sp3')), sv_id=sv_id)
+
+    with pytest.raises(SystemExit) as exc:
+        cli_utils.load_positions(args)
+    assert exc.value.code == cli_utils.EXIT_CODE_FILE_NOT_FOUND
+
+
+@pytest.mark.parametrize('sv_id', ['G09', None, 'ALL'])
+def test_load_positions_exits_on_other_files(tmp_path, sv_id):
+    not_sp3 = tmp_path.joinpath('brdc.nav')
+    not_sp3.write_text("     3.04           N: GNSS NAV DATA    M: MIXED\n")
+    args = argparse.Namespace(sp3=str(not_sp3), sv_id=sv_id)
+
+    with pytest.raises(SystemExit) as exc:
+        cli_utils.load_positions(args)
+    assert exc.value.code == cli_utils.EXIT_CODE_FILE_INVALID
+
+
+# plotting options
+# ****************
+
+def test_all_requires_save():
+    parser = cli_utils.make_parser('', '', '')
+
+    with pytest.raises(SystemExit):
+        cli_utils.parse_args(parser, [str(SP3_FILE), '--sv_id', 'ALL'])
+
+    args = cli_utils.parse_args(parser, [str(SP3_FILE), '--sv_id', 'ALL', '--save'])
+    assert not cli_utils.show_plot(args)
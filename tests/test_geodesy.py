@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+
+import math
+import pathlib
+
+import numpy as np
+import pytest
+
+import gnsstoolbox.gnsstools as tools
+import gnsstoolbox.orbits as orb
+
+from gnss_tools import geodesy
+
+
+SP3_FILE = pathlib.Path(__file__).parents[1].joinpath('data', 'sp3', 'igs18754.sp3')
+
+# observer in Thessaloniki (lon, lat in rad, h in m)
+OBSERVER_GEO = (math.radians(22.96), math.radians(40.63), 50.)
+
+
+@pytest.fixture(scope='module')
+def positions():
+    """The ECEF positions (m) of a satellite of the test file, one array per axis."""
+    orbit = orb.orbit()
+    orbit.loadSp3(str(SP3_FILE))
+    rows = orbit.getSp3('G', 9)[0]
+
+    return tuple(np.ascontiguousarray(rows[:, i] * 1000.) for i in (1, 2, 3))
+
+
+@pytest.fixture(params=['numpy', 'numba'])
+def backend(request, monkeypatch):
+    """Run a test with the NumPy fallback and, if available, the numba kernels."""
+    if request.param == 'numba':
+        pytest.importorskip('numba')
+        monkeypatch.setattr(geodesy, '_kernels', None)
+    else:
+        monkeypatch.setattr(geodesy, '_kernels', False)
+
+    return request.param
+
+
+def az_el_reference(observer, x, y, z):
+    """Azimuths and elevations computed the `gnsstoolbox` way, point by point."""
+    lon0, lat0, _ = tools.toolCartGeoGRS80(*(np.array([v, v]) for v in observer))
+    foot = np.array(tools.tool_geocart_GRS80(lon0[0], lat0[0], 0.))
+    rot = tools.matCart2Local(lon0[0], lat0[0])
+
+    az_el = []
+    for pos in zip(x, y, z):
+        e, n, u = rot @ (np.array(pos) - foot)
+        az = 2. * math.atan(e / (math.hypot(e, n) + n))
+        az_el.append((az + 2. * math.pi if az < 0. else az,
+                      math.asin(u / math.sqrt(e**2 + n**2 + u**2))))
+
+    return np.array(az_el).T
+
+
+# coordinate transformations
+# **************************
+
+def test_ecef_to_geo_grs80_matches_gnsstoolbox(positions, backend):
+    lon, lat, h = geodesy.ecef_to_geo_grs80(*positions)
+    ref_lon, ref_lat, ref_h = tools.toolCartGeoGRS80(*(v.copy() for v in positions))
+
+    np.testing.assert_allclose(lon, ref_lon, rtol=0., atol=1e-9)
+    np.testing.assert_allclose(lat, ref_lat, rtol=0., atol=1e-8)
+    np.testing.assert_allclose(h, ref_h, rtol=0., atol=0.25)
+
+
+def test_ecef_to_az_el_matches_gnsstoolbox(positions, backend):
+    observer = tools.tool_geocart_GRS80(*OBSERVER_GEO)
+    az_el = geodesy.ecef_to_az_el(observer, *positions)
+
+    np.testing.assert_allclose(az_el, az_el_reference(observer, *positions), rtol=0., atol=1e-9)
+    assert ((0. <= az_el[0]) & (az_el[0] < 2. * math.pi)).all()
+
+
+def test_float32_keeps_dtype_and_accuracy(positions, backend):
+    geo = geodesy.ecef_to_geo_grs80(*positions)
+    geo32 = geodesy.ecef_to_geo_grs80(*(v.astype(np.float32) for v in positions))
+
+    assert geo32.dtype == np.float32
+    np.testing.assert_allclose(geo32[:2], geo[:2], rtol=0., atol=3e-7)
+    np.testing.assert_allclose(geo32[2], geo[2], rtol=0., atol=3.)
+
+
+def test_numba_matches_numpy(positions, monkeypatch):
+    pytest.importorskip('numba')
+    observer = tools.tool_geocart_GRS80(*OBSERVER_GEO)
+    # (S, N) slabs, as for several satellites
+    x, y, z = (np.stack((v, v[::-1])) for v in positions)
+
+    monkeypatch.setattr(geodesy, '_kernels', None)
+    geo = geodesy.ecef_to_geo_grs80(x, y, z)
+    az_el = geodesy.ecef_to_az_el(observer, x, y, z)
+
+    monkeypatch.setattr(geodesy, '_kernels', False)
+    assert geo.shape == (3,) + x.shape and az_el.shape == (2,) + x.shape
+    np.testing.assert_allclose(geo, geodesy.ecef_to_geo_grs80(x, y, z), rtol=1e-12, atol=1e-6)
+    np.testing.assert_allclose(az_el, geodesy.ecef_to_az_el(observer, x, y, z), rtol=0., atol=1e-12)
+
+
+def test_nan_positions_give_nan_silently(positions, backend):
+    x, y, z = (np.stack((v, v)) for v in positions)
+    x[1, ::2] = y[1, ::2] = z[1, ::2] = np.nan
+    observer = tools.tool_geocart_GRS80(*OBSERVER_GEO)
+
+    with np.errstate(invalid='raise'):
+        geo = geodesy.ecef_to_geo_grs80(x, y, z)
+        az_el = geodesy.ecef_to_az_el(observer, x, y, z)
+
+    assert np.isnan(geo[:, 1, ::2]).all() and np.isnan(az_el[:, 1, ::2]).all()
+    np.testing.assert_array_equal(geo[:, 1, 1::2], geo[:, 0, 1::2])
+    np.testing.assert_array_equal(az_el[:, 1, 1::2], az_el[:, 0, 1::2])